@@ -5,14 +5,22 @@ Token Exchange Monitor - Multi-Chain Edition
 """
 
 import os
-import json
+import re
+import functools
 import time
 import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, List, Dict, Tuple
 
 import yaml
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util import Retry
 
 # 配置日志
 logging.basicConfig(
@@ -21,14 +29,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 全局HTTP会话：复用TCP/TLS连接，并对429/5xx自动重试
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': 'token-exchange-monitor/1.0'})
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
+))
+
+
+class RateLimiter:
+    """滑动窗口限速器：任意time_period秒内最多rate次调用（线程安全）"""
+
+    def __init__(self, rate: int, time_period: float = 1.0):
+        self.rate = rate
+        self.time_period = time_period
+        self._calls = deque(maxlen=rate)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到允许下一次调用"""
+        with self._lock:
+            if len(self._calls) == self.rate:
+                wait = self._calls[0] + self.time_period - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            self._calls.append(time.monotonic())
+
+
+# Etherscan免费版每个API Key限制5次/秒，留少量余量
+ETHERSCAN_RATE_LIMITERS: Dict[str, RateLimiter] = {}
+_ETHERSCAN_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_etherscan_limiter(api_key: str) -> RateLimiter:
+    """获取API Key对应的限速器，同一Key的所有Etherscan请求共享"""
+    with _ETHERSCAN_RATE_LIMITERS_LOCK:
+        limiter = ETHERSCAN_RATE_LIMITERS.get(api_key)
+        if limiter is None:
+            limiter = RateLimiter(rate=5, time_period=1.1)
+            ETHERSCAN_RATE_LIMITERS[api_key] = limiter
+        return limiter
+
 
 # ========== 配置加载模块 ==========
 
+@functools.lru_cache(maxsize=4)
+def _parse_config(mtime_ns: int) -> dict:
+    """解析config.yaml，按文件修改时间缓存"""
+    with open('config.yaml', 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
 def load_config() -> dict:
-    """加载config.yaml配置文件"""
+    """
+    加载config.yaml配置文件
+    文件未修改时直接复用上次的解析结果（返回共享对象，请勿修改）
+    """
     try:
-        with open('config.yaml', 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+        return _parse_config(os.stat('config.yaml').st_mtime_ns)
     except FileNotFoundError:
         logger.error("config.yaml not found!")
         raise
@@ -41,9 +105,9 @@ def load_state() -> dict:
     """加载last_state.json，记录已处理的交易"""
     if os.path.exists('last_state.json'):
         try:
-            with open('last_state.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
+            with open('last_state.json', 'rb') as f:
+                return orjson.loads(f.read())
+        except orjson.JSONDecodeError:
             logger.warning("last_state.json corrupted, resetting...")
             return {'processed_tx': []}
     return {'processed_tx': []}
@@ -51,17 +115,24 @@ def load_state() -> dict:
 
 def save_state(state: dict):
     """保存状态到last_state.json"""
-    with open('last_state.json', 'w', encoding='utf-8') as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    with open('last_state.json', 'wb') as f:
+        f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2))
+
+
+@functools.lru_cache(maxsize=4)
+def _parse_exchange_addresses(mtime_ns: int) -> dict:
+    """解析exchange_addresses.json，按文件修改时间缓存"""
+    with open('exchange_addresses.json', 'rb') as f:
+        return orjson.loads(f.read())
 
 
 def load_exchange_addresses() -> dict:
-    """加载已知交易所地址库"""
+    """加载已知交易所地址库（文件未修改时复用上次的解析结果）"""
     if os.path.exists('exchange_addresses.json'):
         try:
-            with open('exchange_addresses.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
+            # 返回副本，调用方可以安全地添加新地址
+            return dict(_parse_exchange_addresses(os.stat('exchange_addresses.json').st_mtime_ns))
+        except orjson.JSONDecodeError:
             logger.warning("exchange_addresses.json corrupted, resetting...")
             return {}
     return {}
@@ -69,12 +140,114 @@ def load_exchange_addresses() -> dict:
 
 def save_exchange_addresses(addresses: dict):
     """保存交易所地址库"""
-    with open('exchange_addresses.json', 'w', encoding='utf-8') as f:
-        json.dump(addresses, f, indent=2, ensure_ascii=False)
+    with open('exchange_addresses.json', 'wb') as f:
+        f.write(orjson.dumps(addresses, option=orjson.OPT_INDENT_2))
 
 
 # ========== API调用模块 ==========
 
+# Transfer事件的topic0
+# Transfer(address indexed from, address indexed to, uint256 value)
+TRANSFER_TOPIC0 = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+# getLogs / eth_blockNumber 的固定请求参数
+GETLOGS_PARAMS = {
+    'module': 'logs',
+    'action': 'getLogs',
+    'topic0': TRANSFER_TOPIC0
+}
+BLOCK_NUMBER_PARAMS = {
+    'module': 'proxy',
+    'action': 'eth_blockNumber'
+}
+
+# getLogs单页最大条数（Etherscan上限）
+GETLOGS_PAGE_SIZE = 1000
+
+# 单个区块内交易过多时最多翻页数
+MAX_BLOCK_PAGES = 10
+
+
+def fetch_logs(api_url: str, params: dict) -> Optional[List[dict]]:
+    """
+    执行一次getLogs请求（受API Key限速）
+    返回logs列表（按区块升序）；API返回错误时返回None，网络错误时抛出异常
+    """
+    get_etherscan_limiter(params['apikey']).acquire()
+    response = SESSION.get(api_url, params=params, timeout=30)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+
+    if data['status'] == '1' and data['message'] == 'OK':
+        return data['result']
+    elif data['status'] == '0' and 'No records found' in data.get('message', ''):
+        return []
+
+    logger.error(f"API error: {data.get('message', 'Unknown error')}")
+    logger.debug(f"API response: {data}")
+    return None
+
+
+def fetch_latest_logs(
+    api_url: str,
+    params: dict,
+    from_block: int,
+    to_block: int,
+    offset: int
+) -> Optional[List[dict]]:
+    """
+    获取[from_block, to_block]内最新的offset条logs（按区块升序）
+
+    getLogs分页按区块升序返回，每次按最大页长GETLOGS_PAGE_SIZE查询：
+    窗口内不足一页时一次请求即可，在本地截取最新的offset条。
+    仅当整页返回时，二分查找更窄的窗口[lo, to_block]：
+    一旦某个窗口不足一页且至少offset条，直接截取；
+    否则最终[lo+1, to_block]内不足offset条，再对区块lo单独翻页补足
+    """
+    def query(start: int, end: int, page: int = 1) -> Optional[List[dict]]:
+        return fetch_logs(api_url, {
+            **params,
+            'fromBlock': start,
+            'toBlock': end,
+            'page': page,
+            'offset': GETLOGS_PAGE_SIZE
+        })
+
+    logs = query(from_block, to_block)
+    if logs is None:
+        return None
+    if len(logs) < GETLOGS_PAGE_SIZE:
+        return logs[-offset:]
+
+    # 不变式：[lo, to_block]至少一整页，[hi, to_block]不足offset条（newer为其全部logs）
+    lo, hi = from_block, to_block + 1
+    newer = []
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        result = query(mid, to_block)
+        if result is None:
+            return None
+        if len(result) >= GETLOGS_PAGE_SIZE:
+            lo = mid
+        elif len(result) >= offset:
+            return result[-offset:]
+        else:
+            hi, newer = mid, result
+
+    # 区块lo内按页获取，保留最新的部分
+    need = offset - len(newer)
+    block_logs = []
+    for page in range(1, MAX_BLOCK_PAGES + 1):
+        result = query(lo, lo, page)
+        if result is None:
+            return None
+        block_logs = (block_logs + result)[-need:]
+        if len(result) < GETLOGS_PAGE_SIZE:
+            break
+
+    return block_logs + newer
+
+
 def get_token_transfers(
     contract_address: str,
     api_key: str,
@@ -82,106 +255,241 @@ def get_token_transfers(
     chain_id: int,
     chain_name: str = "Ethereum",
     page: int = 1,
-    offset: int = 100
+    offset: int = 100,
+    *,
+    from_block: int,
+    to_block: int
 ) -> List[dict]:
     """
-    获取代币转账记录
+    获取代币转账记录（按时间倒序）
     使用Etherscan API V2: module=logs&action=getLogs
     监控Transfer事件: Transfer(address,address,uint256)
-    """
-    # Transfer事件的topic0
-    # Transfer(address indexed from, address indexed to, uint256 value)
-    transfer_topic = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
-
-    # 根据不同链设置合适的起始区块（查询最近几天的数据）
-    # 每10分钟运行一次，覆盖最近一周的数据足够
-    start_blocks = {
-        'Ethereum': 21400000,  # 2026年1月，约1周前
-        'BSC': 45900000,       # 2026年1月，约1周前
-        'Polygon': 66000000,   # 预留
-        'Arbitrum': 290000000  # 预留
-    }
-
-    from_block = start_blocks.get(chain_name, 0)
+    只获取[from_block, to_block]窗口内最新的offset条（见fetch_latest_logs）
 
+    返回记录中的value和timeStamp均为整数，调用方无需再次转换
+    """
     params = {
+        **GETLOGS_PARAMS,
         'chainid': chain_id,
-        'module': 'logs',
-        'action': 'getLogs',
         'address': contract_address,
-        'fromBlock': from_block,
-        'toBlock': 'latest',
-        'topic0': transfer_topic,
         'apikey': api_key
     }
 
     try:
-        response = requests.get(api_url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-
-        if data['status'] == '1' and data['message'] == 'OK':
-            # 转换logs格式为类似tokentx的格式
-            transfers = []
-            for log in data['result']:
-                # 解析log数据
-                # topics[1] = from address (padded to 32 bytes)
-                # topics[2] = to address (padded to 32 bytes)
-                # data = value (hex)
-                if len(log['topics']) >= 3:
-                    from_addr = '0x' + log['topics'][1][-40:]  # 取最后40个字符
-                    to_addr = '0x' + log['topics'][2][-40:]
-                    value = log['data']  # hex value
-
-                    transfers.append({
-                        'hash': log['transactionHash'],
-                        'from': from_addr,
-                        'to': to_addr,
-                        'value': str(int(value, 16)),  # 转为十进制字符串
-                        'timeStamp': str(int(log['timeStamp'], 16))
-                    })
-
-            # 按时间倒序排序，返回最近的N条
-            transfers.sort(key=lambda x: int(x['timeStamp']), reverse=True)
-            return transfers[:offset]
-
-        elif data['status'] == '0' and 'No records found' in data.get('message', ''):
-            return []
-        else:
-            logger.error(f"API error: {data.get('message', 'Unknown error')}")
-            logger.debug(f"API response: {data}")
+        logs = fetch_latest_logs(api_url, params, from_block, to_block, offset)
+        if logs is None:
             return []
 
-    except requests.RequestException as e:
+        # 转换logs格式为类似tokentx的格式
+        transfers = []
+        for log in logs:
+            # 解析log数据
+            # topics[1] = from address (padded to 32 bytes)
+            # topics[2] = to address (padded to 32 bytes)
+            # data = value (hex)
+            topics = log['topics']
+            if len(topics) >= 3:
+                # 32字节topic的后20字节（第26个字符起）即为地址
+                transfers.append({
+                    'hash': log['transactionHash'],
+                    'from': '0x' + topics[1][26:],
+                    'to': '0x' + topics[2][26:],
+                    'value': int(log['data'][2:] or '0', 16),  # 保留为整数，空data视为0
+                    'timeStamp': int(log['timeStamp'], 16)
+                })
+
+        # 服务端已按区块升序返回，倒序即为最新在前
+        transfers.reverse()
+        return transfers
+
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         logger.error(f"Request failed: {e}")
         return []
 
 
+# 每次查询回溯的区块数（可在config.yaml中按链设置lookback_blocks覆盖）
+# 需覆盖cron间隔（10分钟）并留出GitHub Actions调度延迟的余量，约按50分钟以上估算
+DEFAULT_LOOKBACK_BLOCKS = {
+    'Ethereum': 500,     # 约12秒/块，约100分钟
+    'BSC': 4000,         # 约0.75秒/块，约50分钟
+    'Polygon': 1500,     # 约2秒/块，约50分钟
+    'Arbitrum': 12000    # 约0.25秒/块，约50分钟
+}
+BLOCK_LOOKBACK = 500  # 未知链的默认值
+
+
+def get_lookback_blocks(chain: dict) -> int:
+    """获取该链每次查询回溯的区块数"""
+    return chain.get(
+        'lookback_blocks',
+        DEFAULT_LOOKBACK_BLOCKS.get(chain['name'], BLOCK_LOOKBACK)
+    )
+
+
+def get_latest_block(api_key: str, api_url: str, chain_id: int) -> Optional[int]:
+    """
+    获取链上最新区块号
+    使用Etherscan API V2: module=proxy&action=eth_blockNumber
+    """
+    params = {**BLOCK_NUMBER_PARAMS, 'chainid': chain_id, 'apikey': api_key}
+
+    try:
+        get_etherscan_limiter(api_key).acquire()
+        response = SESSION.get(api_url, params=params, timeout=10)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        return int(data['result'], 16)
+
+    except requests.RequestException as e:
+        logger.error(f"Failed to get latest block: {e}")
+        return None
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"Invalid eth_blockNumber response: {e}")
+        return None
+
+
+# 每个API Key的最大并发请求数（只限制并发，请求频率由get_etherscan_limiter控制）
+ETHERSCAN_MAX_WORKERS = 5
+
+
+def fetch_latest_blocks(keyed_chains: List[Tuple[dict, str]]) -> Dict[str, Optional[int]]:
+    """
+    并发获取各条链的最新区块号
+    keyed_chains: [(chain, api_key), ...]
+
+    返回：{链名称: 最新区块号}
+    """
+    if not keyed_chains:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(ETHERSCAN_MAX_WORKERS, len(keyed_chains))) as executor:
+        futures = {
+            chain['name']: executor.submit(
+                get_latest_block, api_key, chain['explorer_api'], chain['chain_id']
+            )
+            for chain, api_key in keyed_chains
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def fetch_all_transfers(
+    jobs: List[Tuple[dict, dict, str, int]],
+    offset: int = 100
+) -> Dict[Tuple[str, str], List[dict]]:
+    """
+    并发获取所有代币的转账记录
+    jobs: [(chain, token, api_key, latest_block), ...]
+    查询截至latest_block的最近get_lookback_blocks(chain)个区块
+    按api_key_env分组，每个API Key使用独立线程池
+
+    返回：{(链名称, 代币符号): 转账记录}
+    """
+    groups: Dict[str, List[Tuple[dict, dict, str, int]]] = {}
+    for job in jobs:
+        groups.setdefault(job[0]['api_key_env'], []).append(job)
+
+    executors = []
+    futures = {}
+    for group in groups.values():
+        executor = ThreadPoolExecutor(max_workers=min(ETHERSCAN_MAX_WORKERS, len(group)))
+        executors.append(executor)
+        for chain, token, api_key, latest_block in group:
+            futures[(chain['name'], token['symbol'])] = executor.submit(
+                get_token_transfers,
+                contract_address=token['contract'],
+                api_key=api_key,
+                api_url=chain['explorer_api'],
+                chain_id=chain['chain_id'],
+                chain_name=chain['name'],
+                offset=offset,
+                from_block=latest_block - get_lookback_blocks(chain),
+                to_block=latest_block
+            )
+
+    try:
+        return {key: future.result() for key, future in futures.items()}
+    finally:
+        for executor in executors:
+            executor.shutdown()
+
+
 def get_token_price(coingecko_id: str, api_url: str) -> Optional[float]:
     """
     获取代币USD价格
     使用CoinGecko API
     """
+    return get_token_prices_bulk([coingecko_id], api_url).get(coingecko_id)
+
+
+def get_token_prices_bulk(coingecko_ids: List[str], api_url: str) -> Dict[str, float]:
+    """
+    批量获取代币USD价格
+    CoinGecko的ids参数支持逗号分隔，一次请求获取所有代币价格
+    """
+    unique_ids = sorted(set(coingecko_ids))
     url = f"{api_url}/simple/price"
     params = {
-        'ids': coingecko_id,
+        'ids': ','.join(unique_ids),
         'vs_currencies': 'usd'
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = SESSION.get(url, params=params, timeout=10)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
 
-        if coingecko_id in data and 'usd' in data[coingecko_id]:
-            return float(data[coingecko_id]['usd'])
-        else:
-            logger.error(f"Price not found for {coingecko_id}")
-            return None
+        prices = {}
+        for coingecko_id in unique_ids:
+            if coingecko_id in data and 'usd' in data[coingecko_id]:
+                prices[coingecko_id] = float(data[coingecko_id]['usd'])
+            else:
+                logger.error(f"Price not found for {coingecko_id}")
+        return prices
 
-    except requests.RequestException as e:
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         logger.error(f"CoinGecko API failed: {e}")
-        return None
+        return {}
+
+
+# 进程内价格缓存: {coingecko_id: {'usd': float, 'ts': epoch}}
+# 仅对同一进程内多次调用main()（常驻循环）有效，GitHub Actions每次运行都是新进程
+PRICE_CACHE: Dict[str, dict] = {}
+
+
+def get_token_prices_cached(
+    coingecko_ids: List[str],
+    api_url: str,
+    ttl: int = 120,
+    cache: Optional[dict] = None
+) -> Dict[str, float]:
+    """
+    带TTL缓存的批量价格查询
+    仅对过期或缺失的代币发起请求，并就地更新缓存（默认使用PRICE_CACHE）
+    """
+    if cache is None:
+        cache = PRICE_CACHE
+
+    now = time.time()
+    prices = {}
+    missing = []
+
+    for coingecko_id in set(coingecko_ids):
+        entry = cache.get(coingecko_id)
+        if entry and now - entry.get('ts', 0) < ttl:
+            prices[coingecko_id] = entry['usd']
+        else:
+            missing.append(coingecko_id)
+
+    if prices:
+        logger.info(f"💾 Price cache hit: {len(prices)} token(s)")
+
+    if missing:
+        fetched = get_token_prices_bulk(missing, api_url)
+        for coingecko_id, price in fetched.items():
+            cache[coingecko_id] = {'usd': price, 'ts': now}
+        prices.update(fetched)
+
+    return prices
 
 
 def get_address_label_from_web(address: str, explorer_url: str) -> Optional[str]:
@@ -195,7 +503,7 @@ def get_address_label_from_web(address: str, explorer_url: str) -> Optional[str]
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
 
-        response = requests.get(url, headers=headers, timeout=10)
+        response = SESSION.get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
         # 查找地址标签（Etherscan网页上的格式）
@@ -204,7 +512,6 @@ def get_address_label_from_web(address: str, explorer_url: str) -> Optional[str]
 
         # 尝试从页面标题中提取
         # 格式: "Address 0x... | Etherscan" 或 "Label Name | Address 0x... | Etherscan"
-        import re
 
         # 查找类似 "Binance: Deposit" 这样的标签
         # 在Etherscan上，标签通常出现在地址旁边
@@ -241,16 +548,61 @@ def get_address_label_from_web(address: str, explorer_url: str) -> Optional[str]
 
 # ========== 地址标签识别模块 ==========
 
+def resolve_address_label(
+    address: str,
+    explorer_url: str,
+    exchange_addresses: dict,
+    label_cache: dict
+) -> Optional[str]:
+    """
+    获取地址标签：优先查地址库，未命中时从区块链浏览器网页抓取
+    label_cache为本轮缓存，同时记录未找到标签的地址，避免重复抓取和等待
+    """
+    address_lower = address.lower()
+    if address_lower in label_cache:
+        return label_cache[address_lower]
+
+    label = exchange_addresses.get(address_lower)
+    if not label:
+        label = get_address_label_from_web(address, explorer_url)
+        if label:
+            exchange_addresses[address_lower] = label
+        time.sleep(0.5)  # 避免速率限制
+
+    label_cache[address_lower] = label
+    return label
+
+
+def build_exchange_matcher(exchanges: List[str]) -> Tuple[re.Pattern, Dict[str, str]]:
+    """
+    将交易所名称编译为单个正则，一次扫描即可匹配所有交易所
+
+    返回：(小写名称的正则, {小写名称: 原始名称})
+    """
+    names = {}
+    for exchange in exchanges:
+        names.setdefault(exchange.lower(), exchange)
+
+    if not names:
+        return re.compile(r'(?!)'), names  # 永不匹配
+
+    pattern = re.compile('|'.join(re.escape(name) for name in names))
+    return pattern, names
+
+
 def check_is_exchange_deposit(
     to_address: str,
     to_label: Optional[str],
     from_label: Optional[str],
-    exchanges: List[str],
-    deposit_keywords: List[str]
+    exchange_matcher: Tuple[re.Pattern, Dict[str, str]],
+    deposit_keywords: Tuple[str, ...]
 ) -> Tuple[bool, Optional[str]]:
     """
     检查是否为外部地址向交易所充值
 
+    exchange_matcher: build_exchange_matcher() 的返回值
+    deposit_keywords: 预先转换的小写关键字元组
+
     返回：(是否匹配, 交易所名称)
 
     规则：
@@ -265,48 +617,41 @@ def check_is_exchange_deposit(
     to_label_lower = to_label.lower()
 
     # 检查To地址是否包含Deposit关键字
-    has_deposit_keyword = any(
-        keyword.lower() in to_label_lower
-        for keyword in deposit_keywords
-    )
-
-    if not has_deposit_keyword:
+    if not any(keyword in to_label_lower for keyword in deposit_keywords):
         return False, None
 
     # 检查To地址是否包含交易所名称
-    matched_exchange = None
-    for exchange in exchanges:
-        if exchange.lower() in to_label_lower:
-            matched_exchange = exchange
-            break
+    exchange_pattern, exchange_names = exchange_matcher
+    match = exchange_pattern.search(to_label_lower)
 
-    if not matched_exchange:
+    if not match:
         return False, None
 
+    matched_exchange = exchange_names[match.group(0)]
+
     # 检查From地址是否包含交易所名称（排除内部转账）
     if from_label:
-        from_label_lower = from_label.lower()
-        for exchange in exchanges:
-            if exchange.lower() in from_label_lower:
-                logger.debug(f"Skipping internal transfer: {from_label} -> {to_label}")
-                return False, None
+        if exchange_pattern.search(from_label.lower()):
+            logger.debug(f"Skipping internal transfer: {from_label} -> {to_label}")
+            return False, None
 
     return True, matched_exchange
 
 
 # ========== Lark消息推送模块 ==========
 
-def format_message(tx_info: dict) -> str:
-    """
-    格式化Lark消息 - 根据监控模式使用不同模板
-    """
-    if tx_info['notification_type'] == 'exchange_deposit':
-        # 模式1: 交易所充值提醒
-        from_display = tx_info['from_address_short']
-        if tx_info.get('from_label'):
-            from_display += f" ({tx_info['from_label']})"
+def format_address(short_address: str, label: Optional[str]) -> str:
+    """地址展示格式：短地址 (标签)"""
+    if label:
+        return f"{short_address} ({label})"
+    return short_address
 
-        return f"""🚨 代币转入交易所提醒
+
+def format_exchange_deposit_message(tx_info: dict) -> str:
+    """模式1: 交易所充值提醒"""
+    from_display = format_address(tx_info['from_address_short'], tx_info.get('from_label'))
+
+    return f"""🚨 代币转入交易所提醒
 
 💎 代币: {tx_info['token_symbol']} ({tx_info['token_name']}) [{tx_info['chain_name']}]
 💰 金额: {tx_info['amount']:,.2f} {tx_info['token_symbol']}
@@ -319,17 +664,13 @@ def format_message(tx_info: dict) -> str:
 ---
 监控系统 | Powered by GitHub Actions"""
 
-    elif tx_info['notification_type'] == 'whale_transfer':
-        # 模式2: 巨鲸转账提醒
-        from_display = tx_info['from_address_short']
-        if tx_info.get('from_label'):
-            from_display += f" ({tx_info['from_label']})"
 
-        to_display = tx_info['to_address_short']
-        if tx_info.get('to_label'):
-            to_display += f" ({tx_info['to_label']})"
+def format_whale_transfer_message(tx_info: dict) -> str:
+    """模式2: 巨鲸转账提醒"""
+    from_display = format_address(tx_info['from_address_short'], tx_info.get('from_label'))
+    to_display = format_address(tx_info['to_address_short'], tx_info.get('to_label'))
 
-        return f"""🐋 大额转账提醒
+    return f"""🐋 大额转账提醒
 
 💎 代币: {tx_info['token_symbol']} ({tx_info['token_name']}) [{tx_info['chain_name']}]
 💰 金额: {tx_info['amount']:,.2f} {tx_info['token_symbol']}
@@ -343,7 +684,51 @@ def format_message(tx_info: dict) -> str:
 ---
 监控系统 | Powered by GitHub Actions"""
 
-    return ""
+
+# 通知类型 -> 消息模板
+MESSAGE_FORMATTERS = {
+    'exchange_deposit': format_exchange_deposit_message,
+    'whale_transfer': format_whale_transfer_message,
+}
+
+
+def format_message(tx_info: dict) -> str:
+    """
+    格式化Lark消息 - 根据监控模式使用不同模板
+    """
+    formatter = MESSAGE_FORMATTERS.get(tx_info['notification_type'])
+    if formatter is None:
+        return ""
+    return formatter(tx_info)
+
+
+# Lark自定义机器人限制5次/秒且100次/分钟，两个限速器都需满足
+LARK_RATE_LIMITERS = (
+    RateLimiter(rate=5, time_period=1.0),
+    RateLimiter(rate=100, time_period=60.0),
+)
+
+
+class LarkWebhookError(Exception):
+    """Lark webhook返回非0 code，消息未被接收"""
+
+
+def post_lark_message(webhook_url: str, message: dict):
+    """发送Lark webhook请求（受LARK_RATE_LIMITERS限速），失败时抛出异常"""
+    for limiter in LARK_RATE_LIMITERS:
+        limiter.acquire()
+
+    try:
+        response = SESSION.post(webhook_url, json=message, timeout=10)
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get('code') != 0:
+            raise LarkWebhookError(f"Lark webhook failed: {result.get('msg')}")
+
+    except requests.RequestException as e:
+        logger.error(f"Failed to send Lark notification: {e}")
+        raise
 
 
 def send_lark_notification(webhook_url: str, tx_info: dict):
@@ -354,18 +739,127 @@ def send_lark_notification(webhook_url: str, tx_info: dict):
             "text": format_message(tx_info)
         }
     }
+    post_lark_message(webhook_url, message)
+
+
+# 每张卡片最多包含的通知数（Lark卡片大小上限约30KB，每条约0.5KB）
+LARK_CARD_MAX_ENTRIES = 20
+
+
+def build_lark_card(tx_infos: List[dict], title_suffix: str = "") -> dict:
+    """将同一代币的多条通知合并为一张Lark消息卡片"""
+    first = tx_infos[0]
+    elements = []
+    for tx_info in tx_infos:
+        if elements:
+            elements.append({"tag": "hr"})
+        elements.append({
+            "tag": "div",
+            "text": {"tag": "plain_text", "content": format_message(tx_info)}
+        })
+
+    return {
+        "msg_type": "interactive",
+        "card": {
+            "config": {"wide_screen_mode": True},
+            "header": {
+                "title": {
+                    "tag": "plain_text",
+                    "content": f"{first['token_symbol']} [{first['chain_name']}] {len(tx_infos)}笔大额转账{title_suffix}"
+                }
+            },
+            "elements": elements
+        }
+    }
 
-    try:
-        response = requests.post(webhook_url, json=message, timeout=10)
-        response.raise_for_status()
 
-        result = response.json()
-        if result.get('code') != 0:
-            raise Exception(f"Lark webhook failed: {result.get('msg')}")
+def send_lark_messages_individually(webhook_url: str, tx_infos: List[dict]) -> int:
+    """逐条发送Lark消息，返回成功发送的通知数"""
+    sent = 0
+    for tx_info in tx_infos:
+        try:
+            send_lark_notification(webhook_url, tx_info)
+            logger.info(f"✅ Notified: {tx_info['tx_hash'][:10]}... (${tx_info['usd_value']:,.2f})")
+            sent += 1
+        except Exception as e:
+            logger.error(f"❌ Failed to send notification: {e}")
+    return sent
 
-    except requests.RequestException as e:
-        logger.error(f"Failed to send Lark notification: {e}")
-        raise
+
+def is_unsent_error(e: Exception) -> bool:
+    """
+    判断请求是否在发送前失败（连接未建立），此时消息一定未送达
+    Lark明确拒收（非0 code）同样视为未送达；
+    连接中断、读取超时等可能发生在请求已发出之后，不视为未送达
+    """
+    if isinstance(e, (LarkWebhookError, requests.ConnectTimeout)):
+        return True
+    if isinstance(e, requests.ConnectionError) and e.args:
+        return isinstance(getattr(e.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+def send_lark_notifications(webhook_url: str, tx_infos: List[dict]) -> int:
+    """
+    批量发送Lark消息
+    多条通知按LARK_CARD_MAX_ENTRIES分组，每组合并为一张卡片发送。
+    仅当卡片确定未送达（见is_unsent_error）时退回逐条发送；
+    连接中断、读取超时等情况下卡片可能已送达，不再重发以免重复播报
+
+    返回：成功发送的通知数
+    """
+    if len(tx_infos) == 1:
+        return send_lark_messages_individually(webhook_url, tx_infos)
+
+    chunks = [
+        tx_infos[i:i + LARK_CARD_MAX_ENTRIES]
+        for i in range(0, len(tx_infos), LARK_CARD_MAX_ENTRIES)
+    ]
+
+    sent = 0
+    for index, chunk in enumerate(chunks, 1):
+        title_suffix = f" ({index}/{len(chunks)})" if len(chunks) > 1 else ""
+        try:
+            post_lark_message(webhook_url, build_lark_card(chunk, title_suffix))
+        except Exception as e:
+            if not is_unsent_error(e):
+                logger.error(f"❌ Failed to send card notification (not retried): {e}")
+                continue
+            logger.warning(f"⚠️  Card notification failed, falling back to single messages: {e}")
+            sent += send_lark_messages_individually(webhook_url, chunk)
+            continue
+
+        for tx_info in chunk:
+            logger.info(f"✅ Notified: {tx_info['tx_hash'][:10]}... (${tx_info['usd_value']:,.2f})")
+        sent += len(chunk)
+
+    return sent
+
+
+# ========== 交易过滤模块 ==========
+
+def filter_large_transfers(
+    transfers: List[dict],
+    price: float,
+    decimals: int,
+    usd_threshold: float
+) -> List[Tuple[dict, float, float]]:
+    """
+    按USD阈值筛选大额转账
+    阈值预先换算为代币最小单位，每条转账只需一次整数比较，
+    仅对通过筛选的转账计算金额
+
+    返回：[(转账记录, 代币数量, USD价值), ...]
+    """
+    unit = 10 ** decimals
+    min_value = usd_threshold / price * unit
+
+    large_transfers = []
+    for tx in transfers:
+        if tx['value'] >= min_value:
+            amount = tx['value'] / unit
+            large_transfers.append((tx, amount, amount * price))
+    return large_transfers
 
 
 # ========== 主流程 ==========
@@ -379,7 +873,10 @@ def main():
     # 1. 加载配置和状态
     config = load_config()
     state = load_state()
+    # 有序集合：O(1)去重判断，超过1000条时淘汰最早的记录
+    processed = OrderedDict((k, None) for k in state.get('processed_tx', [])[-1000:])
     exchange_addresses = load_exchange_addresses()
+    original_addresses = dict(exchange_addresses)  # 用于判断地址库是否有变化
 
     # 2. 获取环境变量
     lark_webhook_url = os.getenv('LARK_WEBHOOK_URL')
@@ -389,6 +886,45 @@ def main():
 
     total_notifications = 0
 
+    # 预先编译交易所匹配正则，转换Deposit关键字为小写
+    exchange_matcher = build_exchange_matcher(config['exchanges'])
+    deposit_kw_lc = tuple(k.lower() for k in config['deposit_keywords'])
+
+    # 批量获取所有代币价格（一次请求），与Etherscan查询并行进行
+    coingecko_ids = [
+        token['coingecko_id']
+        for chain in config['chains']
+        for token in chain['tokens']
+    ]
+    with ThreadPoolExecutor(max_workers=1) as price_executor:
+        prices_future = price_executor.submit(
+            get_token_prices_cached,
+            coingecko_ids,
+            config['coingecko_api_url'],
+            ttl=config.get('price_cache_ttl', 120)
+        )
+
+        # 每条链只查询一次最新区块，该链所有代币共用
+        keyed_chains = [
+            (chain, os.getenv(chain['api_key_env']))
+            for chain in config['chains']
+            if os.getenv(chain['api_key_env'])
+        ]
+        latest_blocks = fetch_latest_blocks(keyed_chains)
+
+        # 并发获取所有代币的转账记录（获取最近100笔交易）
+        # 最新区块未知时跳过该链，避免查询到旧交易而重复播报
+        jobs = []
+        for chain, api_key in keyed_chains:
+            latest_block = latest_blocks.get(chain['name'])
+            if not latest_block:
+                continue
+            for token in chain['tokens']:
+                jobs.append((chain, token, api_key, latest_block))
+        transfers_by_token = fetch_all_transfers(jobs, offset=100)
+
+        prices = prices_future.result()
+
     # 3. 遍历每条链
     for chain in config['chains']:
         logger.info("")
@@ -402,16 +938,20 @@ def main():
             logger.error(f"❌ API Key not found: {chain['api_key_env']}")
             continue
 
+        if not latest_blocks.get(chain['name']):
+            logger.warning(f"⚠️  Failed to get latest block for {chain['name']}, skipping chain this run...")
+            continue
+
+        # 本轮地址标签缓存（按链隔离，包含未找到标签的地址）
+        label_cache = {}
+
         # 遍历该链上的每个代币
         for token in chain['tokens']:
             logger.info("")
             logger.info(f"📊 Checking {token['symbol']} on {chain['name']}...")
 
             # 3.1 获取代币价格
-            price = get_token_price(
-                token['coingecko_id'],
-                config['coingecko_api_url']
-            )
+            price = prices.get(token['coingecko_id'])
 
             if not price:
                 logger.warning(f"⚠️  Failed to get price for {token['symbol']}, skipping...")
@@ -420,14 +960,7 @@ def main():
             logger.info(f"💵 Current price: ${price:.6f}")
 
             # 3.2 获取最近的转账记录
-            transfers = get_token_transfers(
-                contract_address=token['contract'],
-                api_key=api_key,
-                api_url=chain['explorer_api'],
-                chain_id=chain['chain_id'],
-                chain_name=chain['name'],
-                offset=100  # 获取最近100笔交易
-            )
+            transfers = transfers_by_token.get((chain['name'], token['symbol']), [])
 
             if not transfers:
                 logger.info(f"ℹ️  No transactions found")
@@ -438,26 +971,19 @@ def main():
             # 3.3 过滤和处理交易
             notified_count = 0
             above_threshold_count = 0
+            pending_notifications = []
+            tx_key_prefix = f"{chain['name']}:{token['symbol']}:"
 
-            for tx in transfers:
-                # 构造唯一标识
-                tx_key = f"{chain['name']}:{token['symbol']}:{tx['hash']}"
-
-                # 跳过已处理的交易
-                if tx_key in state.get('processed_tx', []):
-                    continue
-
-                # 计算金额（考虑decimals）
-                try:
-                    amount = int(tx['value']) / (10 ** token['decimals'])
-                except (ValueError, KeyError):
-                    logger.warning(f"Invalid transaction value: {tx.get('hash')}")
-                    continue
-
-                usd_value = amount * price
+            # 先按阈值筛选（考虑decimals），绝大多数交易在此被过滤
+            large_transfers = filter_large_transfers(
+                transfers, price, token['decimals'], config['usd_threshold']
+            )
 
-                # 检查是否超过阈值
-                if usd_value < config['usd_threshold']:
+            for tx, amount, usd_value in large_transfers:
+                # 构造唯一标识，跳过已处理的交易
+                tx_key = tx_key_prefix + tx['hash']
+                if tx_key in processed:
+                    processed.move_to_end(tx_key)
                     continue
 
                 # 记录超过阈值的交易
@@ -475,24 +1001,12 @@ def main():
 
                 if token['monitor_mode'] == 'exchange_deposit':
                     # 模式1: 仅播报交易所充值
-                    to_addr_lower = tx['to'].lower()
-                    from_addr_lower = tx['from'].lower()
-
-                    # 获取或抓取to地址标签
-                    to_label = exchange_addresses.get(to_addr_lower)
-                    if not to_label:
-                        to_label = get_address_label_from_web(tx['to'], chain['explorer_url'])
-                        if to_label:
-                            exchange_addresses[to_addr_lower] = to_label
-                        time.sleep(0.5)  # 避免速率限制
-
-                    # 获取或抓取from地址标签
-                    from_label = exchange_addresses.get(from_addr_lower)
-                    if not from_label:
-                        from_label = get_address_label_from_web(tx['from'], chain['explorer_url'])
-                        if from_label:
-                            exchange_addresses[from_addr_lower] = from_label
-                        time.sleep(0.5)  # 避免速率限制
+                    to_label = resolve_address_label(
+                        tx['to'], chain['explorer_url'], exchange_addresses, label_cache
+                    )
+                    from_label = resolve_address_label(
+                        tx['from'], chain['explorer_url'], exchange_addresses, label_cache
+                    )
 
                     logger.info(f"     To label: {to_label or 'Unknown'}")
                     logger.info(f"     From label: {from_label or 'Unknown'}")
@@ -500,7 +1014,7 @@ def main():
                     # 检查是否匹配交易所充值
                     is_deposit, exchange_name = check_is_exchange_deposit(
                         tx['to'], to_label, from_label,
-                        config['exchanges'], config['deposit_keywords']
+                        exchange_matcher, deposit_kw_lc
                     )
 
                     if is_deposit:
@@ -515,23 +1029,13 @@ def main():
                     should_notify = True
                     notification_type = 'whale_transfer'
 
-                    to_addr_lower = tx['to'].lower()
-                    from_addr_lower = tx['from'].lower()
-
                     # 获取或抓取地址标签（用于展示，不影响播报）
-                    to_label = exchange_addresses.get(to_addr_lower)
-                    if not to_label:
-                        to_label = get_address_label_from_web(tx['to'], chain['explorer_url'])
-                        if to_label:
-                            exchange_addresses[to_addr_lower] = to_label
-                        time.sleep(0.5)
-
-                    from_label = exchange_addresses.get(from_addr_lower)
-                    if not from_label:
-                        from_label = get_address_label_from_web(tx['from'], chain['explorer_url'])
-                        if from_label:
-                            exchange_addresses[from_addr_lower] = from_label
-                        time.sleep(0.5)
+                    to_label = resolve_address_label(
+                        tx['to'], chain['explorer_url'], exchange_addresses, label_cache
+                    )
+                    from_label = resolve_address_label(
+                        tx['from'], chain['explorer_url'], exchange_addresses, label_cache
+                    )
 
                 if not should_notify:
                     continue
@@ -553,37 +1057,33 @@ def main():
                     'to_label': to_label,
                     'tx_hash': tx['hash'],
                     'timestamp': datetime.fromtimestamp(
-                        int(tx['timeStamp'])
+                        tx['timeStamp']
                     ).strftime('%Y-%m-%d %H:%M:%S UTC')
                 }
 
-                # 发送Lark通知
-                try:
-                    send_lark_notification(lark_webhook_url, tx_info)
-                    logger.info(f"✅ Notified: {tx['hash'][:10]}... (${usd_value:,.2f})")
-                    notified_count += 1
-                    total_notifications += 1
-                except Exception as e:
-                    logger.error(f"❌ Failed to send notification: {e}")
+                # 加入待发送列表，该代币处理完后统一发送
+                pending_notifications.append(tx_info)
 
                 # 记录已处理
-                if 'processed_tx' not in state:
-                    state['processed_tx'] = []
-                state['processed_tx'].append(tx_key)
+                processed[tx_key] = None
+                if len(processed) > 1000:
+                    processed.popitem(last=False)
 
-                # 避免发送过快
-                time.sleep(1)
+            # 3.4 发送Lark通知
+            if pending_notifications:
+                notified_count = send_lark_notifications(lark_webhook_url, pending_notifications)
+                total_notifications += notified_count
 
             logger.info(f"📊 Summary: {above_threshold_count} large transfers (>${config['usd_threshold']})")
             logger.info(f"✅ {token['symbol']}: {notified_count} notifications sent")
 
-    # 4. 限制状态文件大小，只保留最近1000条
-    if 'processed_tx' in state:
-        state['processed_tx'] = state['processed_tx'][-1000:]
+    # 4. 写回已处理交易（已限制为最近1000条）
+    state['processed_tx'] = list(processed)
 
     # 5. 保存状态
     save_state(state)
-    save_exchange_addresses(exchange_addresses)
+    if exchange_addresses != original_addresses:
+        save_exchange_addresses(exchange_addresses)
 
     logger.info("")
     logger.info("="*60)
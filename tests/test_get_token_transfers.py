@@ -0,0 +1,117 @@
+"""get_token_transfers 窗口查询测试（模拟Etherscan getLogs分页行为）"""
+
+import orjson
+import pytest
+
+import monitor
+
+
+class FakeResponse:
+    def __init__(self, payload: dict):
+        self.content = orjson.dumps(payload)
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeEtherscan:
+    """按区块升序、page/offset分页返回logs，与Etherscan getLogs一致"""
+
+    def __init__(self, blocks: dict):
+        # blocks: {区块号: 该区块内的log数量}
+        self.logs = []
+        for block in sorted(blocks):
+            for i in range(blocks[block]):
+                self.logs.append({
+                    'topics': [monitor.TRANSFER_TOPIC0, '0x' + '0' * 24 + 'a' * 40, '0x' + '0' * 24 + 'b' * 40],
+                    'data': hex(10 ** 18),
+                    'timeStamp': hex(block),
+                    'transactionHash': f'0x{block}-{i}',
+                    'blockNumber': block,
+                })
+        self.requests = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.requests += 1
+        start, end = params['fromBlock'], params['toBlock']
+        matched = [log for log in self.logs if start <= log['blockNumber'] <= end]
+        page, offset = params['page'], params['offset']
+        result = matched[(page - 1) * offset:page * offset]
+        if not result:
+            return FakeResponse({'status': '0', 'message': 'No records found', 'result': []})
+        return FakeResponse({'status': '1', 'message': 'OK', 'result': result})
+
+
+class NoopLimiter:
+    def acquire(self):
+        pass
+
+
+@pytest.fixture
+def etherscan(monkeypatch):
+    def install(blocks):
+        fake = FakeEtherscan(blocks)
+        monkeypatch.setattr(monitor.SESSION, 'get', fake.get)
+        monkeypatch.setattr(monitor, 'get_etherscan_limiter', lambda api_key: NoopLimiter())
+        return fake
+    return install
+
+
+def fetch(offset=100):
+    return monitor.get_token_transfers(
+        '0xtoken', 'key', 'https://api.example', 1,
+        offset=offset, from_block=1000, to_block=1500
+    )
+
+
+def newest_hashes(fake, n):
+    return [log['transactionHash'] for log in reversed(fake.logs)][:n]
+
+
+def test_window_with_few_logs_returns_all(etherscan):
+    fake = etherscan({1100: 3, 1400: 2})
+    transfers = fetch()
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 5)
+    assert fake.requests == 1
+
+
+def test_window_under_one_page_needs_single_request(etherscan):
+    fake = etherscan({1100: 300, 1200: 400, 1450: 250})
+    transfers = fetch()
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 100)
+    assert fake.requests == 1
+
+
+def test_all_logs_in_older_half(etherscan):
+    fake = etherscan({1300: 150})
+    transfers = fetch()
+    assert len(transfers) == 100
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 100)
+    assert fake.requests == 1
+
+
+def test_full_page_with_all_logs_in_older_half(etherscan):
+    fake = etherscan({1300: 1500})
+    transfers = fetch()
+    assert len(transfers) == 100
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 100)
+
+
+def test_returns_newest_logs_spread_across_window(etherscan):
+    fake = etherscan({block: 1 for block in range(1000, 1501)})
+    transfers = fetch()
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 100)
+    assert transfers[0]['timeStamp'] == 1500
+
+
+def test_full_page_spread_across_window(etherscan):
+    fake = etherscan({block: 3 for block in range(1000, 1501)})
+    transfers = fetch()
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 100)
+    assert fake.requests < 10
+
+
+def test_busy_block_combined_with_newer_logs(etherscan):
+    fake = etherscan({1100: 400, 1200: 1300, 1450: 30})
+    transfers = fetch()
+    assert [t['hash'] for t in transfers] == newest_hashes(fake, 100)